@@ -5,18 +5,32 @@ import json
 import yaml
 import re
 from datetime import datetime, timedelta, UTC
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 import os
-from tabulate import tabulate
+from tabulate import tabulate, tabulate_formats
 import argparse
+import functools
+import heapq
 import logging
 import pathlib
+import sys
 from datetime import datetime
 import tempfile
+import threading
+import time
 import requests
 import json
-import time
-import shutil
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 # Define constants
@@ -24,6 +38,60 @@ DEFAULT_REPO_FILE = "repo_files.json"
 DEFAULT_CONFIG_FILE = "jfrog_cleanup_config.yaml"
 DEFAULT_LOG_LEVEL = "INFO"
 DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+MAX_SPEC_PATTERNS = 50000
+MAX_TABLE_ROWS = 500
+SECONDS_PER_DAY = 86400
+DEFAULT_TABLE_FORMAT = "heavy_grid"
+AQL_MAX_RETRIES = 5
+AQL_BACKOFF_FACTOR = 0.5
+# In-memory file specs are staged on tmpfs when available
+SPEC_TMP_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+# First three path elements, where the third starts with "build_"
+_BUILD_FOLDER_RE = re.compile(r"([^/]*/[^/]*/build_[^/]*)(?:/|$)")
+# .include( in an AQL query, also with whitespace before the parenthesis
+_INCLUDE_RE = re.compile(r"\.include\s*\(")
+
+
+def _dumps(obj):
+    """
+    Serialize an object to compact JSON bytes, using orjson when installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
+
+def _loads(data):
+    """
+    Parse JSON from str or bytes, using orjson when installed.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+@functools.lru_cache(maxsize=1 << 20)
+def _parse_ts(date_value):
+    """
+    Parse an Artifactory timestamp (DATE_FORMAT) into a POSIX timestamp.
+    Slices the fixed-width fields directly instead of going through strptime,
+    and is memoized since files from the same build often share timestamps.
+    Returns a float so callers compare plain numbers instead of datetimes.
+    Args:
+        date_value (str): Timestamp such as 2024-01-31T12:34:56.789Z.
+    Returns:
+        float: Seconds since the epoch (UTC).
+    """
+    return datetime(
+        int(date_value[0:4]),
+        int(date_value[5:7]),
+        int(date_value[8:10]),
+        int(date_value[11:13]),
+        int(date_value[14:16]),
+        int(date_value[17:19]),
+        int(date_value[20:-1].ljust(6, "0")),
+        UTC,
+    ).timestamp()
 
 
 def load_config(config_file):
@@ -40,15 +108,83 @@ def load_config(config_file):
 
 def load_repo_files(repo_file):
     """
-    Load repository file metadata from a JSON file.
+    Stream repository file metadata from a JSON file.
+    Uses ijson when installed so entries can be classified while the rest of
+    the file is still being read; otherwise parses the whole file at once.
     Args:
-        repo_file (str): Path to the JSON file.
+        repo_file (str): Path to the JSON file (dict with 'results').
+    Yields:
+        dict: One file metadata entry from 'results' at a time.
+    """
+    if ijson is None:
+        with open(repo_file, "rb") as f:
+            yield from _loads(f.read())["results"]
+        return
+    with open(repo_file, "rb") as f:
+        yield from ijson.items(f, "results.item", use_float=True)
+
+
+def _run_aql_query(aql_query, logger=None):
+    """
+    Run one AQL query through the JFrog CLI. Rate-limited (HTTP 429) and
+    server-side (5xx) failures are retried with exponential backoff; any
+    other failure is raised right away, since retrying will not fix it.
+    Args:
+        aql_query (str): Full AQL query including offset/limit.
     Returns:
-        list or dict: Parsed JSON data (list of dicts or dict with 'results').
+        dict: Parsed AQL response.
+    Raises:
+        RuntimeError: If the query fails or every retry is used up.
     """
-    with open(repo_file, "r") as f:
-        data = json.load(f)
-        return data
+    # Use JFrog CLI to perform the REST API operation
+    curl_cmd = [
+        "jf",
+        "rt",
+        "curl",
+        "/api/search/aql",
+        "-XPOST",
+        "-H",
+        "Content-Type: text/plain",
+        "-d",
+        aql_query,
+    ]
+    for attempt in range(AQL_MAX_RETRIES + 1):
+        if attempt:
+            time.sleep(AQL_BACKOFF_FACTOR * 2 ** (attempt - 1))
+        try:
+            # Raw bytes go straight to the JSON parser without a decode
+            result = subprocess.run(curl_cmd, capture_output=True)
+        except Exception as e:
+            raise RuntimeError(f"AQL query failed: {e}") from e
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"AQL query failed: {result.stderr.decode(errors='replace')}"
+            )
+        try:
+            data = _loads(result.stdout)
+        except ValueError as e:
+            raise RuntimeError(
+                f"AQL query returned invalid JSON: "
+                f"{result.stdout[:500].decode(errors='replace')}"
+            ) from e
+        # jf rt curl exits 0 on HTTP errors; Artifactory reports them in an
+        # {"errors": [{"status": ..., "message": ...}]} body instead
+        errors = data.get("errors") if isinstance(data, dict) else None
+        if not errors:
+            return data
+        statuses = [e.get("status") for e in errors if isinstance(e, dict)]
+        if not any(
+            isinstance(status, int) and (status == 429 or status >= 500)
+            for status in statuses
+        ):
+            raise RuntimeError(f"AQL query failed: {errors}")
+        if logger:
+            logger.warning(
+                f"AQL query failed (attempt {attempt + 1} of {AQL_MAX_RETRIES + 1}): {errors}"
+            )
+    raise RuntimeError(
+        f"AQL query failed after {AQL_MAX_RETRIES + 1} attempts: {errors}"
+    )
 
 
 def run_aql_pagination(
@@ -56,140 +192,132 @@ def run_aql_pagination(
     limit,
     logger=None,
     output_file="aqloutput.json",
+    page_delay=0,
 ):
     """
     Run AQL with pagination, mimicking the bash logic provided. Aggregates all results into a single output file.
     input_aql: path to file containing the AQL query (without .include or .offset/.limit)
     limit: int, number of results per page
-    artifactory_url: base URL of Artifactory
-    auth: (username, password) tuple or None
-    api_key: str or None
     logger: logger instance
     output_file: output file to write aggregated results
+    page_delay: seconds to wait between pages (default: no delay)
     """
 
     start_pos = 0
     total_results = 0
     query_count = 0
-    temp_dir = tempfile.mkdtemp()
-    if logger:
-        logger.info(f"Using temporary directory: {temp_dir}")
-    result_files = []
-    while True:
-        query_count += 1
-        temp_aql = os.path.join(temp_dir, f"query_{query_count}.aql")
-        # Read base AQL and append offset/limit
-        with open(input_aql, "r") as f:
-            base_aql = f.read()
-        if ".include(" in base_aql:
-            raise ValueError(
-                "Remove [.include] in the AQL file. .offset will not work with .include."
-            )
-        with open(temp_aql, "w") as f:
-            f.write(base_aql.strip() + f".offset({start_pos}).limit({limit})\n")
-        if logger:
-            logger.info("-" * 80)
-            logger.info(f"Query #{query_count}: start_pos={start_pos}, limit={limit}")
-            logger.info(f"AQL: {open(temp_aql).read()}")
-        # Run the AQL query
-        with open(temp_aql, "r") as f:
-            aql_query = f.read()
-        try:
-            # Use JFrog CLI to perform the REST API operation
-            curl_cmd = [
-                "jf",
-                "rt",
-                "curl",
-                "/api/search/aql",
-                "-XPOST",
-                "-H",
-                "Content-Type: text/plain",
-                "-d",
-                aql_query,
-            ]
-            result = subprocess.run(curl_cmd, capture_output=True, text=True)
-            if result.returncode != 0:
+    # Read and validate the base AQL once; each page only appends offset/limit
+    base_aql = pathlib.Path(input_aql).read_text().strip()
+    if _INCLUDE_RE.search(base_aql):
+        raise ValueError(
+            "Remove [.include] in the AQL file. .offset will not work with .include."
+        )
+    # Stream each page straight into the output file instead of saving pages
+    # to temp files and combining them at the end
+    try:
+        with open(output_file, "wb") as out:
+            out.write(b'{"results": [')
+            while True:
+                query_count += 1
+                aql_query = f"{base_aql}.offset({start_pos}).limit({limit})\n"
                 if logger:
-                    logger.error(f"AQL query failed: {result.stderr}")
-                break
-            data = json.loads(result.stdout)
-        except Exception as e:
-            if logger:
-                logger.error(f"AQL query failed: {e}")
-            break
-        results = data.get("results", [])
-        range_info = data.get("range", {})
-        if logger:
-            logger.info(f"AQL range_info: {range_info}")
-        if not results:
-            if logger:
-                logger.info("No results returned, stopping.")
-            break
-        # Save results to temp file
-        result_file = os.path.join(temp_dir, f"results_{query_count}.json")
-        with open(result_file, "w") as f:
-            json.dump(results, f)
-        result_files.append(result_file)
-        batch_count = len(results)
-        total_results += batch_count
-        current_start = range_info.get("start_pos", 0)
-        current_end = range_info.get("end_pos", 0)
-        current_total = range_info.get("total", 0)
-        current_limit = range_info.get("limit", 0)
+                    # Lazy %-formatting: the query string is only rendered when
+                    # INFO is enabled
+                    logger.info(
+                        "%s\nQuery #%d: start_pos=%d, limit=%d\nAQL: %s",
+                        "-" * 80,
+                        query_count,
+                        start_pos,
+                        limit,
+                        aql_query,
+                    )
+                # Run the AQL query; a failed page raises rather than leaving a
+                # partial listing that could make folders look older than they are
+                data = _run_aql_query(aql_query, logger=logger)
+                results = data.get("results", [])
+                range_info = data.get("range", {})
+                if logger:
+                    logger.info(f"AQL range_info: {range_info}")
+                if not results:
+                    if logger:
+                        logger.info("No results returned, stopping.")
+                    break
+                if total_results:
+                    out.write(b",")
+                out.write(b",".join(_dumps(item) for item in results))
+                batch_count = len(results)
+                total_results += batch_count
+                current_start = range_info.get("start_pos", 0)
+                current_end = range_info.get("end_pos", 0)
+                current_total = range_info.get("total", 0)
+                current_limit = range_info.get("limit", 0)
 
-        if logger:
-            logger.info(f"Results: {current_start} to {current_end} of {current_total}")
-            logger.info(f"Batch size: {batch_count} items")
-        # Check if we've reached the end
-        if current_limit != current_total:
-            if logger:
-                logger.info("*" * 80)
-                logger.info("Reached end of results.")
-                logger.info("*" * 80)
-            break
-        # Update start position for next iteration
-        start_pos = current_end + current_start
-        time.sleep(1)
-    # Combine all results into final output file
-    with open(output_file, "w") as out:
-        all_items = []
-        for rf in result_files:
-            with open(rf, "r") as f:
-                items = json.load(f)
-                all_items.extend(items)
-        json.dump({"results": all_items}, out, indent=2)
+                if logger:
+                    logger.info(
+                        f"Results: {current_start} to {current_end} of {current_total}"
+                    )
+                    logger.info(f"Batch size: {batch_count} items")
+                # Check if we've reached the end
+                if current_limit != current_total:
+                    if logger:
+                        logger.info(
+                            "%s\nReached end of results.\n%s", "*" * 80, "*" * 80
+                        )
+                    break
+                # Update start position for next iteration
+                start_pos = current_end + current_start
+                if page_delay:
+                    time.sleep(page_delay)
+            out.write(b"]}")
+    except BaseException:
+        # Don't leave a truncated listing behind for a later --json run
+        os.unlink(output_file)
+        raise
     if logger:
-        logger.info(f"Total file count in repo : {len(all_items)}")
+        logger.info(f"Total file count in repo : {total_results}")
         logger.info(f"Results saved to {output_file}")
         logger.info(f"File size: {os.path.getsize(output_file)/1024/1024:.2f} MB")
         logger.info("=" * 80)
-
-    # Clean up temp files
-    shutil.rmtree(temp_dir)
     return output_file
 
 
-def print_file_table(logger, title, files):
+def print_file_table(
+    logger,
+    title,
+    files,
+    top_n=MAX_TABLE_ROWS,
+    table_format=DEFAULT_TABLE_FORMAT,
+    date_field="created",
+):
     """
     Print a table of files eligible for deletion under a given title.
     Args:
         title (str): Title for the table.
         files (list): List of file dictionaries.
+        top_n (int): Maximum number of rows to render (the oldest files).
+        table_format (str): tabulate table format used to render the rows.
+        date_field (str): Date field shown and sorted on, used as the header.
     """
-    sorted_files = sorted(files, key=lambda f: f["created"])
+    # Sort on the timestamp parsed by classify_entries rather than the string.
+    # Big lists only render the oldest top_n files, selected with a heap
+    # instead of a full sort; formatting every row can take minutes.
+    if top_n is not None and len(files) > top_n:
+        sorted_files = heapq.nsmallest(top_n, files, key=itemgetter("_ts"))
+    else:
+        sorted_files = sorted(files, key=itemgetter("_ts"))
     headers = [
         "S.No",
         "Full Path",
         "File Name",
-        "Created",
+        date_field.capitalize(),
         "Size (MB)",
     ]
     table = [
         [
             i + 1,
-            os.path.join(f["path"], f["name"]),
+            f["full_file_name"],
             f["name"],
-            datetime.strptime(f["created"], DATE_FORMAT).strftime("%Y-%m-%d %H:%M:%S"),
+            f["_dt_str"],
             round(f["size"] / (1024 * 1024), 2),
         ]
         for i, f in enumerate(sorted_files)
@@ -197,174 +325,419 @@ def print_file_table(logger, title, files):
     total_files = len(files)
     total_size_mb = round(sum(f["size"] for f in files) / (1024 * 1024), 2)
     logger.info(f"\nFiles eligible for deletion under: {title}")
-    logger.info("\n" + tabulate(table, headers=headers, tablefmt="heavy_grid"))
+    logger.info("\n" + tabulate(table, headers=headers, tablefmt=table_format))
+    if total_files > len(sorted_files):
+        logger.info(
+            f"... ({total_files - len(sorted_files)} more rows omitted, showing the "
+            f"{len(sorted_files)} oldest files)"
+        )
     logger.info(f"Total files to be deleted: {total_files}")
     logger.info(f"Total space to be freed: {total_size_mb} MB")
 
 
-def process_cleanup_targets(
+def classify_entries(
     logger=None,
     repo_files={},
     cleanup_target_paths=[],
     protected_paths=[],
-    threshold_date=None,
+    build_folder_pattern=None,
+    threshold_ts=None,
+    threshold_iso=None,
     date_field=None,
+):
+    """
+    Walk the repository results once, collecting files eligible under the
+    cleanup target paths and grouping files by build folder in the same pass.
+    Each file is assigned to the longest target path it falls under.
+    Args:
+        repo_files (iterable): File metadata dictionaries from load_repo_files.
+        cleanup_target_paths (list): List of target path prefixes.
+        protected_paths (tuple): Protected path prefixes, each ending in "/".
+        build_folder_pattern (re.Pattern): Union of the build folder patterns.
+        threshold_ts (float): POSIX timestamp threshold for deletion eligibility.
+        threshold_iso (str): The threshold as "%Y-%m-%dT%H:%M:%S" in UTC.
+        date_field (str): Which date field to use (created/modified/updated).
+    Returns:
+        tuple: (buckets, folders) where buckets maps each unprotected target
+        path to its eligible files outside the protected paths and folders maps each build folder to its
+        running aggregates (oldest/newest timestamp and file name, total
+        size, file count and repo).
+    """
+    protected_paths = tuple(protected_paths)
+    # Targets are tried longest first so nested targets get the closest match.
+    # Protected paths end in "/", so targets are compared in the same form.
+    targets = sorted(
+        (
+            t
+            for t in set(cleanup_target_paths)
+            if t.rstrip("/") + "/" not in protected_paths
+        ),
+        key=len,
+        reverse=True,
+    )
+    targets_tuple = tuple(targets)
+    buckets = {target_path: [] for target_path in targets}
+    folders = {}
+    # (path, get_build_folder result, path is protected) per directory; files
+    # in one directory share it, so the pattern and protection checks run once
+    # per directory and kept entries can share a single path string
+    build_folder_by_path = {}
+    for entry in repo_files:
+        if not isinstance(entry, dict):
+            logger.info(f"Skipping invalid entry: {entry}")
+            continue
+        if entry.get("type") != "file":
+            continue
+        path = entry["path"]
+        in_target = path.startswith(targets_tuple)
+        cached = build_folder_by_path.get(path)
+        if cached is None:
+            # Checked once per directory: the f-string join below relies on
+            # Artifactory never returning a path with a trailing "/"
+            assert not path.endswith("/"), f"Unexpected trailing '/' in {path!r}"
+            # Files under a protected path are never bucketed, even when a
+            # cleanup target above it would otherwise include them
+            path_protected = (path + "/").startswith(protected_paths)
+            if in_target and path_protected:
+                logger.info(f"Skipping protected path: {path}")
+            cached = build_folder_by_path[path] = (
+                path,
+                get_build_folder(
+                    path=path,
+                    pattern=build_folder_pattern,
+                    protected_paths=protected_paths,
+                    logger=logger,
+                ),
+                path_protected,
+            )
+        path, build_folder, path_protected = cached
+        in_target = in_target and not path_protected
+        if not in_target and not build_folder:
+            continue
+        date_value = entry.get(date_field, entry.get("created"))
+        # Fixed-width ISO prefixes compare in date order, so target files from
+        # a later second than the threshold are rejected without parsing
+        in_target = in_target and date_value[:19] <= threshold_iso
+        if not in_target and not build_folder:
+            continue
+        # Parse the date and join the file name once, keeping them on the entry
+        # for the tables, file specs and folder aggregation
+        entry["_ts"] = _parse_ts(date_value)
+        # DATE_FORMAT is fixed-width, so the display string is a plain slice
+        entry["_dt_str"] = date_value[:19].replace("T", " ")
+        # Artifactory paths are always "/"-separated, so skip os.path.join
+        entry["full_file_name"] = f'{path}/{entry["name"]}'
+        if in_target and entry["_ts"] < threshold_ts:
+            # Bucketed entries live until the end of the run; share the
+            # directory's path string and intern the repeated repo/type values
+            entry["path"] = path
+            entry["repo"] = sys.intern(entry["repo"])
+            entry["type"] = sys.intern(entry["type"])
+            for target_path in targets:
+                if path.startswith(target_path):
+                    buckets[target_path].append(entry)
+                    break
+        if not build_folder:
+            continue
+        # Fold the file into its folder's aggregates instead of keeping a
+        # per-folder list of files around for a second pass
+        ts = entry["_ts"]
+        agg = folders.get(build_folder)
+        if agg is None:
+            folders[build_folder] = {
+                "repo": entry.get("repo", ""),
+                "oldest_ts": ts,
+                "oldest_name": entry["name"],
+                "newest_ts": ts,
+                "newest_name": entry["name"],
+                "total_size": entry["size"],
+                "file_count": 1,
+            }
+            continue
+        if ts < agg["oldest_ts"]:
+            agg["oldest_ts"] = ts
+            agg["oldest_name"] = entry["name"]
+        elif ts > agg["newest_ts"]:
+            agg["newest_ts"] = ts
+            agg["newest_name"] = entry["name"]
+        agg["total_size"] += entry["size"]
+        agg["file_count"] += 1
+    return buckets, folders
+
+
+def emit_cleanup(
+    logger=None,
+    buckets={},
+    cleanup_target_paths=[],
+    protected_paths=[],
+    threshold_date=None,
     dry_run=False,
+    now_str=None,
+    top_n=MAX_TABLE_ROWS,
+    table_format=DEFAULT_TABLE_FORMAT,
+    date_field="created",
 ):
     """
-    Process and print eligible files for custom cleanup target paths.
+    Print eligible files for custom cleanup target paths, write a combined
+    file spec for all targets and delete the files unless in dry-run mode.
     Args:
-        repo_files (list): List of file metadata dictionaries.
+        buckets (dict): Eligible files per target path from classify_entries.
         cleanup_target_paths (list): List of target path prefixes.
+        protected_paths (list): List of protected path prefixes.
         threshold_date (datetime): Date threshold for deletion eligibility.
-        date_field (str): Which date field to use (created/modified/updated).
+        dry_run (bool): If True, only write the file specs.
+        now_str (str): Run timestamp used to name the file spec folder.
+        top_n (int): Maximum number of rows per target table.
+        table_format (str): tabulate table format for the target tables.
+        date_field (str): Date field used for eligibility and the tables.
     """
-    now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
     filespec_dir = pathlib.Path(f"fileSpec_{now_str}")
-    filespec_dir.mkdir(parents=True, exist_ok=True)
-    logger.info("-" * 120)
     logger.info(
-        f"Delete files from paths: {cleanup_target_paths} which are older than {threshold_date}"
+        "%s\nDelete files from paths: %s which are older than %s\n%s",
+        "-" * 120,
+        cleanup_target_paths,
+        threshold_date,
+        "-" * 120,
     )
-    logger.info("-" * 120)
+    all_patterns = []
     for target_path in cleanup_target_paths:
-        logger.info("=" * 80)
-        logger.info(f"Processing target path: {target_path}")
-        logger.info("=" * 80)
-        if target_path in protected_paths:
+        logger.info(
+            "%s\nProcessing target path: %s\n%s", "=" * 80, target_path, "=" * 80
+        )
+        # Same comparison as classify_entries, which left out this bucket
+        if target_path.rstrip("/") + "/" in protected_paths:
             logger.info(f"Skipping protected path: {target_path}")
             continue
-        eligible_files = []
-        for entry in repo_files["results"]:
-            if not isinstance(entry, dict):
-                logger.info(f"Skipping invalid entry: {entry}")
-                continue
-            if entry.get("type") != "file":
-                continue
-            if entry["path"].startswith(target_path):
-                date_value = entry.get(date_field, entry.get("created"))
-                created = datetime.strptime(date_value, DATE_FORMAT).replace(tzinfo=UTC)
-                if created < threshold_date:
-                    eligible_files.append(entry)
-        print_file_table(logger, target_path, eligible_files)
-
-        # Write file spec for this target_path if there are eligible files
-        if eligible_files:
-            files = [
-                {"pattern": os.path.join(f["repo"], f["path"], f["name"])}
-                for f in eligible_files
-            ]
-            file_spec = {"files": files}
-            spec_filename = (
-                filespec_dir
-                / f"filespec_{target_path.replace('/', '_')}_{now_str}.json"
+        eligible_files = buckets[target_path]
+        print_file_table(
+            logger,
+            target_path,
+            eligible_files,
+            top_n=top_n,
+            table_format=table_format,
+            date_field=date_field,
+        )
+        all_patterns.extend(
+            f'{f["repo"]}/{f["full_file_name"]}' for f in eligible_files
+        )
+
+    # Write one combined file spec (split into large chunks) for all targets so
+    # the JFrog CLI is started once per chunk instead of once per target path
+    if dry_run and all_patterns:
+        filespec_dir.mkdir(parents=True, exist_ok=True)
+    for i in range(0, len(all_patterns), MAX_SPEC_PATTERNS):
+        chunk = all_patterns[i : i + MAX_SPEC_PATTERNS]
+        if not dry_run:
+            # Hand the spec to delete_folders_with_spec in memory
+            spec = _dumps({"files": [{"pattern": pattern} for pattern in chunk]})
+            delete_folders_with_spec(
+                logger,
+                spec,
+                dry_run=False,
+                label=f"cleanup targets {i // MAX_SPEC_PATTERNS + 1}",
+                pattern_count=len(chunk),
             )
-            with open(spec_filename, "w") as f:
-                json.dump(file_spec, f, indent=2)
-            logger.info(f"File spec written: {spec_filename}")
-            # Call delete_folders_with_spec to delete files
-            if not dry_run:
-                delete_folders_with_spec(logger, str(spec_filename), dry_run=False)
+            continue
+        spec_filename = (
+            filespec_dir
+            / f"filespec_cleanup_targets_{i // MAX_SPEC_PATTERNS + 1}_{now_str}.json"
+        )
+        write_patterns_spec(spec_filename, chunk)
+        logger.info(f"File spec written: {spec_filename}")
 
 
-def write_file_spec(logger, folders, file_spec_filename="folders_to_delete_spec.json"):
+def write_patterns_spec(spec_filename, patterns, pretty=False):
+    """
+    Stream a JFrog CLI file spec to disk one pattern at a time, without
+    building the whole spec in memory first.
+    Args:
+        spec_filename (str): Output file spec filename.
+        patterns (iterable): Pattern strings to include in the spec.
+        pretty (bool): If True, write an indented spec for debugging instead.
+    """
+    if pretty:
+        with open(spec_filename, "w") as f:
+            json.dump({"files": [{"pattern": p} for p in patterns]}, f, indent=2)
+        return
+    with open(spec_filename, "wb") as f:
+        f.write(b'{"files":[')
+        for i, pattern in enumerate(patterns):
+            if i:
+                f.write(b",")
+            f.write(_dumps({"pattern": pattern}))
+        f.write(b"]}")
+
+
+def write_file_spec(
+    logger, folders, file_spec_filename="folders_to_delete_spec.json", pretty=False
+):
     """
     Write a JFrog CLI file spec JSON for folders to be deleted.
     Args:
         folders (list): List of folder info dictionaries.
         file_spec_filename (str): Output file spec filename.
+        pretty (bool): If True, indent the spec for debugging.
     Returns:
         str or None: Path to the file spec JSON, or None if no folders.
     """
     if not folders:
         return None
-    files = []
-    for f in folders:
-        # Expecting folder in the format: repo/path/to/folder
-        # If folder does not contain repo, user should adjust logic as needed
-        files.append({"pattern": f["folder"] + "/**"})
-    file_spec = {"files": files}
-    with open(file_spec_filename, "w") as f:
-        json.dump(file_spec, f, indent=2)
+    # Expecting folder in the format: repo/path/to/folder
+    # If folder does not contain repo, user should adjust logic as needed
+    write_patterns_spec(
+        file_spec_filename, (f["folder"] + "/**" for f in folders), pretty=pretty
+    )
     logger.info(f"File spec written: {file_spec_filename}")
     return file_spec_filename
 
 
+def _log_stream(logger, stream, prefix):
+    """
+    Log each line of a text stream as it arrives.
+    Args:
+        stream (file): Text stream to read until EOF.
+        prefix (str): Text logged before each line.
+    """
+    for line in stream:
+        logger.info("%s%s", prefix, line.rstrip())
+
+
 # --- Execute JFrog CLI delete command using file spec ---
-def delete_folders_with_spec(logger, file_spec_filename, dry_run=False):
+def delete_folders_with_spec(
+    logger, file_spec, dry_run=False, label="spec", pattern_count=None
+):
     """
     Run the JFrog CLI delete command using the generated file spec.
     Args:
-        file_spec_filename (str): Path to the file spec JSON.
+        file_spec (str or bytes): Path to the file spec JSON, or the spec JSON
+            itself, which is staged on tmpfs (when available) for the CLI.
         dry_run (bool): If True, perform a dry run only.
+        label (str): Name of this spec in the log, so the output of
+            concurrent deletions can be told apart.
+        pattern_count (int): Number of patterns in the spec, if known.
     """
-    if not file_spec_filename:
+    if not file_spec:
         logger.info("No file spec to use for deletion.")
         return
-    cmd = ["jf", "rt", "del", "--spec", file_spec_filename]
+    temp_spec = None
+    if isinstance(file_spec, bytes):
+        # Not piped on stdin: the CLI may still prompt for confirmation there
+        with tempfile.NamedTemporaryFile(
+            "wb", suffix=".json", dir=SPEC_TMP_DIR, delete=False
+        ) as tf:
+            tf.write(file_spec)
+        file_spec = temp_spec = tf.name
+    cmd = ["jf", "rt", "del", "--spec", file_spec]
     if dry_run:
         cmd.append("--dry-run")
-    logger.info(f"Running: {' '.join(cmd)}")
+    if pattern_count is not None:
+        logger.info(f"[{label}] Deleting {pattern_count} patterns")
+    logger.info(f"[{label}] Running: {' '.join(cmd)}")
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        logger.info("JFrog CLI output:")
-        logger.info(result.stdout)
-        if result.stderr:
-            logger.info("JFrog CLI errors:")
-            logger.info(result.stderr)
+        # Stream the CLI output line by line instead of buffering it all, so
+        # large deletions log live and memory stays flat
+        with subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1
+        ) as proc:
+            # Drain stderr on a helper thread so a full pipe can't stall the CLI
+            stderr_thread = threading.Thread(
+                target=_log_stream,
+                args=(logger, proc.stderr, f"[{label}] JFrog CLI error: "),
+                daemon=True,
+            )
+            stderr_thread.start()
+            _log_stream(logger, proc.stdout, f"[{label}] JFrog CLI: ")
+            stderr_thread.join()
     except Exception as e:
-        logger.info(f"Error running JFrog CLI: {e}")
+        logger.info(f"[{label}] Error running JFrog CLI: {e}")
+    finally:
+        if temp_spec:
+            os.unlink(temp_spec)
 
 
-def get_build_folder(path=None, patterns=None, protected_paths=None, logger=None):
+def get_build_folder(path=None, pattern=None, protected_paths=None, logger=None):
     """
     Extract the build folder as the third element in the path, only if it starts with 'build_' and matches a pattern and is not protected.
     Args:
         path (str): File path.
-        patterns (list): List of regex patterns as strings.
-        protected_paths (list): List of protected path prefixes.
+        pattern (re.Pattern): Union of the build folder patterns, or None.
+        protected_paths (tuple): Protected path prefixes, each ending in "/".
     Returns:
         str: The build folder path up to the third element, or None if not matched or protected.
     """
-    parts = path.strip("/").split("/")
-    if len(parts) >= 3 and parts[2].startswith("build_"):
-        build_folder = "/".join(parts[:3])
+    m = _BUILD_FOLDER_RE.match(path.strip("/"))
+    if m:
+        build_folder = m.group(1)
         # Check pattern match
-        if patterns:
-            matched = False
-            for pat in patterns:
-                if re.search(pat, build_folder):
-                    matched = True
-                    break
-            if not matched:
-                return None
+        if pattern is not None and not pattern.search(build_folder):
+            return None
         # Check protection
         if protected_paths:
-            # Add trailing slash for consistency with protected_paths
-            folder_with_slash = build_folder + "/"
-            for path in protected_paths:
-                if folder_with_slash.startswith(path):
-                    logger.info(f"Skipping protected path: {build_folder}")
-                    return None
+            # protected_paths all end in "/", so match on the folder plus "/"
+            if (build_folder + "/").startswith(protected_paths):
+                logger.info(f"Skipping protected path: {build_folder}")
+                return None
         return build_folder
     return None
 
 
-def print_table(logger, title, rows):
+def _summarize_folder(folder, agg, threshold_ts, time_threshold_days):
+    """
+    Summarize one build folder for the deletion decision.
+    Args:
+        folder (str): Build folder path without the repo name.
+        agg (dict): The folder's aggregates from classify_entries.
+        threshold_ts (float): POSIX timestamp threshold for deletion eligibility.
+        time_threshold_days (int): Threshold in days, used for the reason text.
+    Returns:
+        tuple: (all_older, folder_info) where all_older is True if every file
+        is older than the threshold.
+    """
+    # The repo name comes from the first file seen in the folder
+    folder = f"{agg['repo']}/{folder}"
+    all_older = agg["newest_ts"] <= threshold_ts
+    oldest = datetime.fromtimestamp(agg["oldest_ts"], UTC)
+    newest = datetime.fromtimestamp(agg["newest_ts"], UTC)
+    # Calculate days difference for oldest and newest on the POSIX timestamps
+    # (floor division matches timedelta.days) instead of datetime arithmetic
+    oldest_days = int((threshold_ts - agg["oldest_ts"]) // SECONDS_PER_DAY)
+    newest_days = int((threshold_ts - agg["newest_ts"]) // SECONDS_PER_DAY)
+    oldest_path = f"({oldest_days}) {agg['oldest_name']}"
+    newest_path = f"({newest_days}) {agg['newest_name']}"
+    total_size = agg["total_size"]
+    folder_info = {
+        "folder": folder,
+        "file_count": agg["file_count"],
+        "oldest": oldest,
+        "newest": newest,
+        "size_MB": round(total_size / (1024 * 1024), 2),
+        "oldest_path": oldest_path,
+        "newest_path": newest_path,
+    }
+    if all_older:
+        folder_info["reason"] = f"All files older than {time_threshold_days} days."
+    else:
+        folder_info["reason"] = f"Some files are newer than {time_threshold_days} days."
+    return all_older, folder_info
+
+
+def print_table(
+    logger, title, rows, top_n=MAX_TABLE_ROWS, table_format=DEFAULT_TABLE_FORMAT
+):
     """
     Print a table of build folders with summary statistics and reasons.
     Args:
         title (str): Table title.
         rows (list): List of folder info dictionaries.
+        top_n (int): Maximum number of rows to render (the largest folders).
+        table_format (str): tabulate table format used to render the rows.
     """
     if not rows:
         logger.info(f"\n{title}: None")
         return
-    # Sort rows by size_MB descending
-    sorted_rows = sorted(rows, key=lambda r: r["size_MB"], reverse=True)
     logger.info(f"\n{title}:")
     # Check if all reasons are the same
-    reasons = set(r["reason"] for r in sorted_rows)
+    reasons = set(r["reason"] for r in rows)
     show_reason = False
     reason_text = None
     if len(reasons) == 1:
@@ -372,6 +745,14 @@ def print_table(logger, title, rows):
         logger.info(f"**{reason_text}**\n")
     else:
         show_reason = True
+    # The table itself is only logged at DEBUG; skip sorting and formatting
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    # Sort rows by size_MB descending, keeping only the largest for big tables
+    if top_n is not None and len(rows) > top_n:
+        sorted_rows = heapq.nlargest(top_n, rows, key=itemgetter("size_MB"))
+    else:
+        sorted_rows = sorted(rows, key=itemgetter("size_MB"), reverse=True)
     headers = [
         "S.No",
         "Folder",
@@ -390,8 +771,8 @@ def print_table(logger, title, rows):
             i + 1,
             r["folder"],
             r["file_count"],
-            r["oldest"],
-            r["newest"],
+            r["oldest"].strftime("%Y-%m-%d %H:%M:%S"),
+            r["newest"].strftime("%Y-%m-%d %H:%M:%S"),
             r["size_MB"],
             r["oldest_path"],
             r["newest_path"],
@@ -399,7 +780,12 @@ def print_table(logger, title, rows):
         if show_reason:
             row.append(r["reason"])
         table.append(row)
-    logger.debug("\n" + tabulate(table, headers=headers, tablefmt="heavy_grid"))
+    logger.debug("\n" + tabulate(table, headers=headers, tablefmt=table_format))
+    if len(rows) > len(sorted_rows):
+        logger.debug(
+            f"... ({len(rows) - len(sorted_rows)} more rows omitted, showing the "
+            f"{len(sorted_rows)} largest folders)"
+        )
 
 
 def main():
@@ -436,13 +822,29 @@ def main():
         default="created",
         help="Which date field to use for age calculation (created/modified/updated). Default: created",
     )
+    parser.add_argument(
+        "--table-format",
+        dest="table_format",
+        choices=tabulate_formats,
+        default=DEFAULT_TABLE_FORMAT,
+        help=f"tabulate format for the output tables, e.g. plain or simple for faster output on large runs. Default: {DEFAULT_TABLE_FORMAT}",
+    )
     args = parser.parse_args()
 
     config = load_config(args.config_file)
-    protected_paths = config.get("protected_paths", [])
+    # Protected prefixes always end in "/" so "a/b" can't also protect
+    # "a/bc"; a tuple lets str.startswith check all of them in one call
+    protected_paths = tuple(
+        p if p.endswith("/") else p + "/" for p in config.get("protected_paths", [])
+    )
     time_threshold_days = config.get("time_threshold_days", 730)
     log_level = config.get("log_level", DEFAULT_LOG_LEVEL).upper()
+    table_max_rows = config.get("table_max_rows", MAX_TABLE_ROWS)
     threshold_date = datetime.now(UTC) - timedelta(days=time_threshold_days)
+    threshold_ts = threshold_date.timestamp()
+    threshold_iso = threshold_date.strftime("%Y-%m-%dT%H:%M:%S")
+    # One timestamp names every spec folder written by this run
+    now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
 
     # Set up logger
     logging.basicConfig(
@@ -453,7 +855,7 @@ def main():
 
     logger.info("Starting JFrog Cleanup Script")
     logger.info(f"Threshold (days): {time_threshold_days}")
-    logger.info(f"Protected paths: {protected_paths}")
+    logger.info(f"Protected paths: {list(protected_paths)}")
     logger.info(
         f"Threshold date (UTC): {threshold_date.strftime('%Y-%m-%d %H:%M:%S %Z')}"
     )
@@ -475,108 +877,102 @@ def main():
         logger.info(
             f"Fetching all files from repo '{args.repo_name}' using run_aql_pagination..."
         )
-        run_aql_pagination(
-            input_aql=aql_file,
-            limit=limit,
-            logger=logger,
-            output_file=repo_file_path,
-        )
-        os.unlink(aql_file)
+        try:
+            run_aql_pagination(
+                input_aql=aql_file,
+                limit=limit,
+                logger=logger,
+                output_file=repo_file_path,
+                page_delay=config.get("aql_page_delay_sec", 0),
+            )
+        finally:
+            os.unlink(aql_file)
     elif not repo_file_path:
         # Default fallback
         repo_file_path = DEFAULT_REPO_FILE
 
     repo_files = load_repo_files(repo_file_path)
     date_field = args.date_field
+    cleanup_target_paths = config.get("cleanup_target_paths", [])
+    # Compile the build folder patterns once into a single alternation so each
+    # folder is matched with one search instead of one per pattern
+    build_folder_patterns = config.get("build_folder_patterns", [])
+    build_folder_pattern = None
+    if build_folder_patterns:
+        build_folder_pattern = re.compile(
+            "|".join(f"(?:{pat})" for pat in build_folder_patterns)
+        )
+
+    # Bucket cleanup target files and group files by build folder (third
+    # element in the path, matching pattern) in a single pass
+    buckets, folders = classify_entries(
+        logger=logger,
+        repo_files=repo_files,
+        cleanup_target_paths=cleanup_target_paths,
+        protected_paths=protected_paths,
+        build_folder_pattern=build_folder_pattern,
+        threshold_ts=threshold_ts,
+        threshold_iso=threshold_iso,
+        date_field=date_field,
+    )
 
     # Process custom cleanup target paths if present
-    cleanup_target_paths = config.get("cleanup_target_paths", [])
     if cleanup_target_paths:
-        process_cleanup_targets(
+        emit_cleanup(
             logger=logger,
-            repo_files=repo_files,
+            buckets=buckets,
             cleanup_target_paths=cleanup_target_paths,
             protected_paths=protected_paths,
             threshold_date=threshold_date,
-            date_field=date_field,
             dry_run=args.dry_run,
+            now_str=now_str,
+            top_n=table_max_rows,
+            table_format=args.table_format,
+            date_field=date_field,
         )
     logger.info("\n" + "=" * 120 + "\n")
 
-    # Group files by build folder (third element in the path, matching pattern)
-    folders = defaultdict(list)
-    build_folder_patterns = config.get("build_folder_patterns", [])
-    for entry in repo_files["results"]:
-        if entry.get("type") != "file":
-            continue
-        build_folder = get_build_folder(
-            path=entry["path"],
-            patterns=build_folder_patterns,
-            protected_paths=protected_paths,
-            logger=logger,
-        )
-        if not build_folder:
-            continue
-        entry["full_file_name"] = os.path.join(entry["path"], entry["name"])
-        folders[build_folder].append(entry)
-
     to_delete = []
     not_selected = []
-    logger.info("-" * 120)
-    logger.info(f"Folders which match the build folder pattern...")
-    logger.info("-" * 120)
+    logger.info(
+        "%s\nFolders which match the build folder pattern...\n%s", "-" * 120, "-" * 120
+    )
     logger.info(f"Total build folders found: {len(folders)}")
     logger.info(f"Processing build folders for deletion criteria...")
-    for folder, files in folders.items():
-        # Get the repo name from the first file in the folder
-        repo_name = files[0].get("repo", "")
-        folder = os.path.join(repo_name, folder)
-        logger.info("=" * 80)
-        logger.info(f"Processing folder: {folder}")
-        logger.info("=" * 80)
-        oldest = None
-        newest = None
-        oldest_file = None
-        newest_file = None
-        total_size = 0
-        all_older = True
-        for f in files:
-            date_value = f.get(date_field, f.get("created"))
-            created = datetime.strptime(date_value, DATE_FORMAT).replace(tzinfo=UTC)
-            if oldest is None or created < oldest:
-                oldest = created
-                oldest_file = f
-            if newest is None or created > newest:
-                newest = created
-                newest_file = f
-            total_size += f["size"]
-            if created > threshold_date:
-                all_older = False
-        # Calculate days difference for oldest and newest
-        oldest_days = (threshold_date - oldest).days
-        newest_days = (threshold_date - newest).days
-        oldest_path = f"({oldest_days}) {oldest_file['name']}"
-        newest_path = f"({newest_days}) {newest_file['name']}"
-        folder_info = {
-            "folder": folder,
-            "file_count": len(files),
-            "oldest": oldest.strftime("%Y-%m-%d %H:%M:%S"),
-            "newest": newest.strftime("%Y-%m-%d %H:%M:%S"),
-            "size_MB": round(total_size / (1024 * 1024), 2),
-            "oldest_path": oldest_path,
-            "newest_path": newest_path,
-        }
+    # Per-folder banners are only built when debug logging is on
+    log_folders = logger.isEnabledFor(logging.DEBUG)
+    # Summarizing a folder only formats its aggregates, which is cheaper than
+    # pickling them to worker processes, so this stays a plain loop
+    for folder, agg in folders.items():
+        all_older, folder_info = _summarize_folder(
+            folder, agg, threshold_ts, time_threshold_days
+        )
+        if log_folders:
+            logger.debug(
+                "%s\nProcessing folder: %s\n%s",
+                "=" * 80,
+                folder_info["folder"],
+                "=" * 80,
+            )
         if all_older:
-            folder_info["reason"] = f"All files older than {time_threshold_days} days."
             to_delete.append(folder_info)
         else:
-            folder_info["reason"] = (
-                f"Some files are newer than {time_threshold_days} days."
-            )
             not_selected.append(folder_info)
 
-    print_table(logger, "Folders to be deleted", to_delete)
-    print_table(logger, "Folders NOT selected for deletion", not_selected)
+    print_table(
+        logger,
+        "Folders to be deleted",
+        to_delete,
+        top_n=table_max_rows,
+        table_format=args.table_format,
+    )
+    print_table(
+        logger,
+        "Folders NOT selected for deletion",
+        not_selected,
+        top_n=table_max_rows,
+        table_format=args.table_format,
+    )
     # Print summary statistics for build folders to be deleted
     if to_delete:
         total_folders = len(to_delete)
@@ -587,31 +983,45 @@ def main():
         logger.info(f"  Total files to be deleted: {total_files}")
         logger.info(f"  Total space to be freed: {total_size} MB")
 
-        # Split to_delete into smaller chunks and write each chunk to a separate spec file
-        now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-        spec_files_dir = pathlib.Path(f"spec_files_{now_str}")
-        spec_files_dir.mkdir(parents=True, exist_ok=True)
+        # Split to_delete into smaller chunks. Dry runs write each chunk to a
+        # separate spec file for review; real runs pass the spec in memory.
         chunk_size = config.get("delete_chunk_size", 100)
-        spec_files = []
-        for i in range(0, len(to_delete), chunk_size):
-            chunk = to_delete[i : i + chunk_size]
-            spec_filename = (
-                spec_files_dir / f"folders_to_delete_spec_{i // chunk_size + 1}.json"
-            )
-            file_spec = write_file_spec(
-                logger, chunk, file_spec_filename=str(spec_filename)
-            )
-            if file_spec:
-                spec_files.append(file_spec)
-
-        # If not dry-run, execute deletion for each spec file
-        if not args.dry_run:
-            for spec_file in spec_files:
-                delete_folders_with_spec(
-                    logger,
-                    spec_file,
-                    dry_run=False,
+        chunks = [
+            to_delete[i : i + chunk_size] for i in range(0, len(to_delete), chunk_size)
+        ]
+        if args.dry_run:
+            spec_files_dir = pathlib.Path(f"spec_files_{now_str}")
+            spec_files_dir.mkdir(parents=True, exist_ok=True)
+            for n, chunk in enumerate(chunks, 1):
+                spec_filename = spec_files_dir / f"folders_to_delete_spec_{n}.json"
+                write_file_spec(logger, chunk, file_spec_filename=str(spec_filename))
+        else:
+            # Each chunk has its own spec and the CLI is network-bound, so a
+            # few chunks are deleted concurrently. On a terminal the CLI may
+            # prompt for confirmation, so chunks run one at a time there.
+            delete_parallelism = config.get("delete_parallelism", 4)
+            if sys.stdin.isatty() and delete_parallelism > 1:
+                logger.info(
+                    "stdin is a terminal; deleting chunks one at a time so JFrog "
+                    "CLI prompts don't overlap"
                 )
+                delete_parallelism = 1
+            with ThreadPoolExecutor(max_workers=delete_parallelism) as executor:
+                futures = [
+                    executor.submit(
+                        delete_folders_with_spec,
+                        logger,
+                        _dumps(
+                            {"files": [{"pattern": f["folder"] + "/**"} for f in chunk]}
+                        ),
+                        dry_run=False,
+                        label=f"chunk {n}/{len(chunks)}",
+                        pattern_count=len(chunk),
+                    )
+                    for n, chunk in enumerate(chunks, 1)
+                ]
+                for future in futures:
+                    future.result()
 
 
 if __name__ == "__main__":